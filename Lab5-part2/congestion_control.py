@@ -1,10 +1,11 @@
+import collections
 import enum
 import logging
-import queue
 import struct
 import threading
-import datetime
+import time
 import matplotlib.pyplot as plt
+import numpy as np
 
 class PacketType(enum.IntEnum):
     DATA = ord('D')
@@ -12,9 +13,11 @@ class PacketType(enum.IntEnum):
     SYN = ord('S')
 
 class Packet:
-    _PACK_FORMAT = '!BI'
-    _HEADER_SIZE = struct.calcsize(_PACK_FORMAT)
+    _STRUCT = struct.Struct('!BI')
+    _HEADER_SIZE = _STRUCT.size
     MAX_DATA_SIZE = 1400 # Leaves plenty of space for IP + UDP + SWP header 
+    RECV_BUF_SIZE = 4096 # Large enough for any datagram the lower layer accepts
+    RECV_BATCH_SIZE = 32 # Datagrams drained per wake-up of a receive thread
 
     def __init__(self, type, seq_num, data=b''):
         self._type = type
@@ -34,43 +37,70 @@ class Packet:
         return self._data
 
     def to_bytes(self):
-        header = struct.pack(Packet._PACK_FORMAT, self._type.value, 
-                self._seq_num)
+        header = Packet._STRUCT.pack(self._type, self._seq_num)
         return header + self._data
+
+    def to_iovec(self):
+        header = Packet._STRUCT.pack(self._type, self._seq_num)
+        return (header, self._data)
        
     @classmethod
     def from_bytes(cls, raw):
-        header = struct.unpack(Packet._PACK_FORMAT,
-                raw[:Packet._HEADER_SIZE])
-        type = PacketType(header[0])
+        """Parse a packet from bytes or a memoryview; for a memoryview the
+        data is a view into the same buffer and must be copied to be kept"""
+        header = Packet._STRUCT.unpack_from(raw)
+        # Keep the raw type byte; PacketType compares equal to it
+        type = header[0]
         seq_num = header[1]
         data = raw[Packet._HEADER_SIZE:]
         return Packet(type, seq_num, data)
 
     def __str__(self):
-        return "{} {}".format(self._type.name, self._seq_num)
+        return "{} {}".format(PacketType(self._type).name, self._seq_num)
 
 class Sender:
     _BUF_SIZE = 5000
 
     def __init__(self, ll_endpoint, use_slow_start=True, use_fast_retransmit=False, threshold= 50):
         self._ll_endpoint = ll_endpoint
-        self._rtt = 2 * (ll_endpoint.transmit_delay + ll_endpoint.propagation_delay)
+
+        # RTT estimates in integer nanoseconds
+        self._rtt_ns = int(2 * (ll_endpoint.transmit_delay + ll_endpoint.propagation_delay) * 1e9)
+        self._rttvar_ns = self._rtt_ns // 4
+        self._rto_ns = 2 * self._rtt_ns
 
         # Initialize data buffer
         self._last_ack_recv = -1
         self._last_seq_sent = -1
         self._last_seq_written = 0
-        self._buf = [None] * Sender._BUF_SIZE
-        self._buf_slot = threading.Semaphore(Sender._BUF_SIZE)
+        self._max_seq_sent = -1 # Highest sequence number ever transmitted
+        self._buf_pkt = [None] * Sender._BUF_SIZE
+        self._buf_cond = threading.Condition() # Signalled when ACKs free slots
 
         # Initialize congestion control
         self._use_slow_start = use_slow_start
         self._use_fast_retransmit = use_fast_retransmit
         self._cwnd = 1
+        self._cwnd_cnt = 0 # ACKs counted towards the next linear increase
+
+        # (seq_num, send_time) of unACK'd packets that were only sent once
+        # since the last timeout, in send order; used for RTT estimates
+        self._outstanding = collections.deque()
+
+        # Duplicate ACK tracking for fast retransmit
+        self._last_ack_val = -1
+        self._dup_ack_count = 0
+        self._in_recovery = False
 
         # Congestion window graph
-        self._plotter = CwndPlotter()
+        self._plotter = CwndPlotter(lambda: self._cwnd)
+
+        # Start retransmission timer thread
+        self._timer_deadline = None
+        self._timer_event = threading.Event()
+        self._timer_thread = threading.Thread(target=self._run_timer)
+        self._timer_thread.daemon = True
+        self._timer_thread.start()
 
         # Start receive thread
         self._shutdown = False
@@ -79,42 +109,62 @@ class Sender:
 
         # Construct and buffer SYN packet
         packet = Packet(PacketType.SYN, 0)
-        self._buf_slot.acquire()
-        self._buf[0] = {"packet" : packet, "send_time" : None}
-        self._timer = None
-        self._transmit(0)
+        with self._buf_cond:
+            self._buf_pkt[0] = packet
+            self._transmit(0)
         
         # Congestion Threshold
         self.threshold = threshold
-        
-        # Array which hold Duplicate ACKs
-        self.duplicate = []
 
     def _transmit(self, seq_num):
         slot = seq_num % Sender._BUF_SIZE
 
         # Send packet
-        packet = self._buf[slot]["packet"]
-        self._ll_endpoint.send(packet.to_bytes())
-        send_time = datetime.datetime.now()
+        packet = self._buf_pkt[slot]
+        self._ll_endpoint.send_iov(packet.to_iovec())
+        send_time = time.monotonic_ns()
 
         # Update last sequence number sent   
         if (self._last_seq_sent < seq_num):
             self._last_seq_sent = seq_num
 
         # Determine if packet is being retransmitted
-        if self._buf[slot]["send_time"] is None:
-            logging.info("Transmit: {}".format(packet))
-            self._buf[slot]["send_time"] = send_time
+        if (self._max_seq_sent < seq_num):
+            logging.info("Transmit: %s", packet)
+            self._max_seq_sent = seq_num
+            self._outstanding.append((seq_num, send_time))
         else:
-            logging.info("Retransmit: {}".format(packet))
-            self._buf[slot]["send_time"] = 0
+            logging.info("Retransmit: %s", packet)
+            # Exclude the packet from RTT estimates
+            if self._outstanding and self._outstanding[0][0] == seq_num:
+                self._outstanding.popleft()
 
-        # Start retransmission timer
-        if self._timer is not None:
-            self._timer.cancel()
-        self._timer = threading.Timer(2 * self._rtt, self._timeout)
-        self._timer.start()
+        # Start retransmission timer unless it is already running
+        if (self._timer_deadline is None):
+            self._timer_deadline = send_time + self._rto_ns
+            self._timer_event.set()
+
+    def _run_timer(self):
+        while True:
+            # Wait until the timer is armed
+            deadline = self._timer_deadline
+            if deadline is None:
+                self._timer_event.wait()
+                self._timer_event.clear()
+                continue
+
+            # Wait for the deadline, starting over if the timer is rearmed
+            remaining = (deadline - time.monotonic_ns()) * 1e-9
+            if remaining > 0:
+                if self._timer_event.wait(remaining):
+                    self._timer_event.clear()
+                continue
+
+            # Time out unless an ACK rearmed or cancelled the timer meanwhile
+            with self._buf_cond:
+                if (self._timer_deadline == deadline):
+                    self._timer_deadline = None
+                    self._timeout()
 
     def send(self, data):
         """Called by clients to send data"""
@@ -122,152 +172,188 @@ class Sender:
             self._send(data[i:i+Packet.MAX_DATA_SIZE])
 
     def _send(self, data):
-        # Wait for a slot in the buffer
-        self._buf_slot.acquire()
-
-        # Construct and buffer packet
-        self._last_seq_written += 1
-        packet = Packet(PacketType.DATA, self._last_seq_written , data)
-        slot = packet.seq_num % Sender._BUF_SIZE
-        self._buf[slot] = {"packet" : packet, "send_time" : None};
-
-        # Send packet if congestion window is not full
-        if (self._last_seq_sent - self._last_ack_recv < int(self._cwnd)):
-            self._transmit(packet.seq_num)
+        with self._buf_cond:
+            # Wait for a slot in the buffer
+            while (self._last_seq_written - self._last_ack_recv >= Sender._BUF_SIZE):
+                self._buf_cond.wait()
+
+            # Construct and buffer packet before making it visible to _recv
+            packet = Packet(PacketType.DATA, self._last_seq_written + 1, data)
+            slot = packet.seq_num % Sender._BUF_SIZE
+            self._buf_pkt[slot] = packet
+            self._last_seq_written = packet.seq_num
+
+            # Send packets in order while congestion window is not full
+            self._fill_window()
         
     def _timeout(self):
+        # Called with _buf_cond held
+
+        # Nothing to retransmit if all data was ACK'd
+        if (self._last_ack_recv >= self._last_seq_written):
+            return
+
         # If slow start is enabled 
         if (self._use_slow_start == True):
             # Half the threshold
-            self.threshold = max(1, self._cwnd/2)
+            self.threshold = max(1, self._cwnd // 2)
             self._cwnd = 1
-            logging.info("CWND: {}".format(self._cwnd))
-            self._plotter.update_cwnd(self._cwnd)
+            logging.info("CWND: %s", self._cwnd)
         else: 
             # Update congestion window
-            self._cwnd = max(1, self._cwnd/2)
-            logging.debug("CWND: {}".format(self._cwnd))
-            self._plotter.update_cwnd(self._cwnd)
-
-        # Assume no packets remain in flight
-        for seq_num in range(self._last_ack_recv+1, self._last_seq_sent+1):
-            slot = seq_num % Sender._BUF_SIZE
-            self._buf[slot]["send_time"] = 0 
+            self._cwnd = max(1, self._cwnd // 2)
+            logging.debug("CWND: %s", self._cwnd)
+        self._cwnd_cnt = 0
+        self._in_recovery = False
+
+        # Assume no packets remain in flight; anything sent before now is
+        # excluded from RTT estimates
+        self._outstanding.clear()
         self._last_seq_sent = self._last_ack_recv
  
         # Sent next unACK'd packet
         self._transmit(self._last_ack_recv + 1)
 
+    def _update_rtt(self, elapsed_ns):
+        # Smooth the RTT (alpha = 0.9) and its mean deviation (beta = 0.25)
+        self._rttvar_ns = (3 * self._rttvar_ns + abs(self._rtt_ns - elapsed_ns)) // 4
+        self._rtt_ns = (9 * self._rtt_ns + elapsed_ns) // 10
+
+        # Time out after twice the RTT, or longer when the RTT is jittery
+        self._rto_ns = self._rtt_ns + max(self._rtt_ns, 4 * self._rttvar_ns)
+        logging.info("Updated RTT estimate: %s ns (RTO %s ns)", self._rtt_ns, self._rto_ns)
+
+    def _free_slots(self, seq_num, count):
+        # Clear count consecutive slots, wrapping around the end of the buffer
+        start = seq_num % Sender._BUF_SIZE
+        stop = min(start + count, Sender._BUF_SIZE)
+        wrapped = count - (stop - start)
+        self._buf_pkt[start:stop] = [None] * (stop - start)
+        if wrapped > 0:
+            self._buf_pkt[:wrapped] = [None] * wrapped
+
     def _recv(self):
-        while (not self._shutdown) or (self._last_ack_recv < self._last_seq_sent):
-            # Receive ACK packet
-            raw = self._ll_endpoint.recv()
-            if raw is None:
-                continue
-            packet = Packet.from_bytes(raw)
-            recv_time = datetime.datetime.now()
-            logging.info("Received: {}".format(packet))
+        # Bind names used on every ACK to locals to avoid repeated lookups
+        ll_recv_many = self._ll_endpoint.recv_many
+        from_bytes = Packet.from_bytes
+        monotonic_ns = time.monotonic_ns
 
-            # If no additional data is ACK'd then ignore the ACK
-            if (packet.seq_num <= self._last_ack_recv):
-                continue
+        # Receive ACKs in batches into the same buffers
+        rx_bufs = [bytearray(Packet.RECV_BUF_SIZE) for i in range(Packet.RECV_BATCH_SIZE)]
+        rx_views = [memoryview(rx_buf) for rx_buf in rx_bufs]
+        rx_counts = []
+        rx_next = 0
 
-            # Update RTT estimate and free ACK'd data 
-            while (self._last_ack_recv < packet.seq_num):
-                self._last_ack_recv += 1
-                slot = self._last_ack_recv % Sender._BUF_SIZE
-
-                # Update RTT estimate
-                send_time = self._buf[slot]["send_time"]
-                if (send_time != None and send_time != 0):
-                    elapsed = recv_time - send_time
-                    self._rtt = self._rtt * 0.9 + elapsed.total_seconds() * 0.1
-                    logging.info("Updated RTT estimate: {}".format(self._rtt))
-
-                # Free slot
-                self._buf[slot] = None
-                self._buf_slot.release()
-
-            # Adjust for ACK of data that was received before last timeout
-            if (self._last_seq_sent < self._last_ack_recv):
-                self._last_seq_sent = self._last_ack_recv
-
-            # Cancel timer if all in flight data was ACK'd
-            if (self._timer != None and self._last_ack_recv == self._last_seq_sent):
-                self._timer.cancel()
-                self._timer = None
-
-            # Add it To Duplicate Buffer If fast transmit is enabled
-            # When Fast Transmit IS ENABLED
-            if self._use_fast_retransmit == True:
-                logging.info("Fast Transmit Enabled "+str(self._use_fast_retransmit))
-                duplicateAckFound = False
-                self.duplicate.append(packet.seq_num)
-                # IF the Duplicate Buffer Array length is Greater then 3
-                if len(self.duplicate) >= 3:
-                    
-                    last_three_elements = self.duplicate[-3:]
-                    retransmission = True
-                    
-                    # Check for Last three Elements
-                    for i in last_three_elements:
-                        if i != packet.seq_num:
-                            retransmission = False
-                    # If they are same then do the retransmission
-                    if retransmission == True:
-                        logging.info("3 Duplicate ACK found "+str(packet.seq_num))
-                        duplicateAckFound = True
-                        # Retransmit
-                        self._transmit(packet.seq_num + 1)
-                        # Update the Congestion Window
-                        self._cwnd = max(1,self._cwnd/2)
-                        # Update the Threshold
-                        self.threshold = max(1,self._cwnd/2)
-                        # Update the Duplicate Array
-                        if(len(self.duplicate == 3)):
-                            self.duplicate = []
-                        else:
-                            self.duplicate = self.duplicate[0:len(self.duplicate) - 3]
-                if(duplicateAckFound == False):
-                    if(self._cwnd >= self.threshold):
-                        # Increase it linearly
-                        self._cwnd = self._cwnd + 1 / self._cwnd
-                        logging.debug("CWND: {}".format(self._cwnd))
-                        self._plotter.update_cwnd(self._cwnd)
-                    else:      
-                        # Double the window everytime        
-                        self._cwnd = self._cwnd  + 1
-                        logging.info("CWND: {}".format(self._cwnd))
-                        self._plotter.update_cwnd(self._cwnd)  
-                    
-                    
-            # WHEN SLOW START IS ENABLED
-            elif (self._use_slow_start == True):
-                logging.info("SLOW START")
-                # If greater or equal to threshold
-                if(self._cwnd >= self.threshold):
-                    # Increase it linearly
-                    self._cwnd = self._cwnd + 1 / self._cwnd
-                    logging.debug("CWND: {}".format(self._cwnd))
-                    self._plotter.update_cwnd(self._cwnd)
-                else:      
-                    # Double the window everytime        
-                    self._cwnd = self._cwnd  + 1
-                    logging.info("CWND: {}".format(self._cwnd))
-                    self._plotter.update_cwnd(self._cwnd)  
-            # WHEN NONE IS ENABLED
-            else :   
-                self._cwnd = self._cwnd + 1 / self._cwnd
-                logging.info("CWND: {}".format(self._cwnd))
-                self._plotter.update_cwnd(self._cwnd)
-
-            # Send next packet while packets are available and congestion window allows
-            while  ((self._last_seq_sent < self._last_seq_written) and
-                    (self._last_seq_sent - self._last_ack_recv < int(self._cwnd))):
-                self._transmit(self._last_seq_sent + 1)
+        while (not self._shutdown) or (self._last_ack_recv < self._last_seq_sent):
+            # Receive ACK packets once the previous batch has been processed
+            if rx_next == len(rx_counts):
+                rx_counts = ll_recv_many(rx_bufs) or []
+                rx_next = 0
+                if not rx_counts:
+                    continue
+            packet = from_bytes(rx_views[rx_next][:rx_counts[rx_next]])
+            rx_next += 1
+            recv_time = monotonic_ns()
+            seq_num = packet.seq_num
+            logging.info("Received: %s", packet)
+
+            with self._buf_cond:
+                self._handle_ack(seq_num, recv_time)
 
         self._ll_endpoint.shutdown()
 
+    def _handle_ack(self, seq_num, recv_time):
+        # Called with _buf_cond held
+
+        # Count duplicates of the last ACK; the first copy is not a duplicate
+        if (seq_num == self._last_ack_val):
+            self._dup_ack_count += 1
+        else:
+            self._last_ack_val = seq_num
+            self._dup_ack_count = 0
+
+        # Fast retransmit and fast recovery on duplicate ACKs
+        if (self._use_fast_retransmit and seq_num == self._last_ack_recv
+                and self._last_ack_recv < self._last_seq_written):
+            if (self._dup_ack_count == 3):
+                # Halve the window and resend the missing packet
+                logging.info("3 Duplicate ACK found %s", seq_num)
+                self.threshold = max(2, self._cwnd // 2)
+                self._cwnd = self.threshold + 3
+                self._cwnd_cnt = 0
+                self._in_recovery = True
+                self._transmit(self._last_ack_recv + 1)
+                logging.info("CWND: %s", self._cwnd)
+            elif (self._in_recovery):
+                # Each further duplicate means another packet left the network
+                self._cwnd = self._cwnd + 1
+                logging.debug("CWND: %s", self._cwnd)
+                self._fill_window()
+
+        # If no additional data is ACK'd then ignore the ACK
+        if (seq_num <= self._last_ack_recv):
+            return
+
+        # Update RTT estimate from the most recently sent packet ACK'd, but
+        # only if none of the ACK'd packets were retransmitted (Karn's rule)
+        send_time = None
+        num_sent_once = 0
+        outstanding = self._outstanding
+        while outstanding and outstanding[0][0] <= seq_num:
+            send_time = outstanding.popleft()[1]
+            num_sent_once += 1
+        if (send_time is not None and num_sent_once == seq_num - self._last_ack_recv):
+            self._update_rtt(recv_time - send_time)
+
+        # Free all ACK'd slots at once
+        num_acked = seq_num - self._last_ack_recv
+        self._free_slots(self._last_ack_recv + 1, num_acked)
+        self._last_ack_recv = seq_num
+        self._buf_cond.notify()
+
+        # Adjust for ACK of data that was received before last timeout
+        if (self._last_seq_sent < self._last_ack_recv):
+            self._last_seq_sent = self._last_ack_recv
+
+        # Cancel timer if all in flight data was ACK'd, otherwise restart it
+        if (self._last_ack_recv == self._last_seq_sent):
+            self._timer_deadline = None
+        else:
+            self._timer_deadline = recv_time + self._rto_ns
+            self._timer_event.set()
+
+        # Leave fast recovery by deflating the window to the threshold
+        if self._in_recovery:
+            self._in_recovery = False
+            self._cwnd = self.threshold
+            logging.info("CWND: %s", self._cwnd)
+        else:
+            self._grow_cwnd()
+
+        self._fill_window()
+
+    def _grow_cwnd(self):
+        if ((self._use_slow_start or self._use_fast_retransmit)
+                and self._cwnd < self.threshold):
+            # Slow start: double the window every RTT
+            self._cwnd += 1
+            logging.info("CWND: %s", self._cwnd)
+        else:
+            # Congestion avoidance: increase the window by one every RTT
+            self._cwnd_cnt += 1
+            if (self._cwnd_cnt >= self._cwnd):
+                self._cwnd += 1
+                self._cwnd_cnt = 0
+            logging.debug("CWND: %s", self._cwnd)
+
+    def _fill_window(self):
+        # Send next packet while packets are available and congestion window
+        # allows, never outrunning the receiver's window
+        max_in_flight = min(self._cwnd, Receiver._BUF_SIZE)
+        while  ((self._last_seq_sent < self._last_seq_written) and
+                (self._last_seq_sent - self._last_ack_recv < max_in_flight)):
+            self._transmit(self._last_seq_sent + 1)
+
 
 class Receiver:
     _BUF_SIZE = 1000
@@ -280,7 +366,8 @@ class Receiver:
         self._recv_window = [None] * Receiver._BUF_SIZE
 
         # Received data waiting for application to consume
-        self._ready_data = queue.Queue()
+        self._ready_data = collections.deque()
+        self._ready_cond = threading.Condition()
 
         # Start receive thread
         self._recv_thread = threading.Thread(target=self._recv)
@@ -288,25 +375,56 @@ class Receiver:
         self._recv_thread.start()
 
     def recv(self):
-        return self._ready_data.get()
+        with self._ready_cond:
+            while not self._ready_data:
+                self._ready_cond.wait()
+            return self._ready_data.popleft()
+
+    def _deliver(self, data):
+        # Hand in-order data to the application
+        with self._ready_cond:
+            self._ready_data.append(data)
+            self._ready_cond.notify()
 
     def _recv(self):
+        # Receive packets in batches into the same buffers
+        rx_bufs = [bytearray(Packet.RECV_BUF_SIZE) for i in range(Packet.RECV_BATCH_SIZE)]
+        rx_views = [memoryview(rx_buf) for rx_buf in rx_bufs]
+        rx_counts = []
+        rx_next = 0
+
         while True:
-            # Receive data packet
-            raw = self._ll_endpoint.recv()
-            packet = Packet.from_bytes(raw)
-            logging.debug("Received: {}".format(packet))
+            # Receive data packets once the previous batch has been processed
+            if rx_next == len(rx_counts):
+                rx_counts = self._ll_endpoint.recv_many(rx_bufs) or []
+                rx_next = 0
+                if not rx_counts:
+                    continue
+            packet = Packet.from_bytes(rx_views[rx_next][:rx_counts[rx_next]])
+            rx_next += 1
+            logging.debug("Received: %s", packet)
 
             # Retransmit ACK, if necessary
             if (packet.seq_num <= self._last_ack_sent):
                 ack = Packet(PacketType.ACK, self._last_ack_sent)
-                self._ll_endpoint.send(ack.to_bytes())
-                logging.debug("Sent: {}".format(ack))
+                self._ll_endpoint.send_iov(ack.to_iovec())
+                logging.debug("Sent: %s", ack)
+                continue
+
+            # Deliver the next expected packet directly when nothing is buffered
+            if (packet.seq_num == self._last_ack_sent + 1
+                    and self._max_seq_recv <= self._last_ack_sent):
+                self._last_ack_sent = packet.seq_num
+                self._max_seq_recv = packet.seq_num
+                self._deliver(bytes(packet.data))
+                ack = Packet(PacketType.ACK, self._last_ack_sent)
+                self._ll_endpoint.send_iov(ack.to_iovec())
+                logging.debug("Sent: %s", ack)
                 continue
 
             # Put data in buffer
             slot = packet.seq_num % Receiver._BUF_SIZE
-            self._recv_window[slot] = packet.data
+            self._recv_window[slot] = bytes(packet.data)
             if packet.seq_num > self._max_seq_recv:
                 self._max_seq_recv = packet.seq_num
 
@@ -323,35 +441,63 @@ class Receiver:
 
                 # Slot is ACK'd
                 ack_num += 1
-                self._ready_data.put(data)
+                self._deliver(data)
                 self._recv_window[next_slot] = None
 
             # Send ACK
             self._last_ack_sent = ack_num
             ack = Packet(PacketType.ACK, self._last_ack_sent)
-            self._ll_endpoint.send(ack.to_bytes())
-            logging.debug("Sent: {}".format(ack))
+            self._ll_endpoint.send_iov(ack.to_iovec())
+            logging.debug("Sent: %s", ack)
 
 class CwndPlotter:
-    def __init__(self, refresh_rate=2):
-        self._start_time = datetime.datetime.now()
-        self._times = [0]
-        self._cwnds = [1]
-        self._last_update = datetime.datetime.now()
+    """Samples the congestion window and redraws the graph on its own thread
+    so that plotting never stalls ACK processing"""
+
+    _INITIAL_SAMPLES = 1024
+
+    def __init__(self, cwnd_source, refresh_rate=2, sample_rate=0.05):
+        self._cwnd_source = cwnd_source
+        self._start_time = time.monotonic_ns()
+        self._times = np.empty(CwndPlotter._INITIAL_SAMPLES, dtype=np.float64)
+        self._cwnds = np.empty(CwndPlotter._INITIAL_SAMPLES, dtype=np.float64)
+        self._times[0] = 0
+        self._cwnds[0] = 1
+        self._num_samples = 1
         self._refresh_rate = refresh_rate
-        self._plot()
-    
+        self._sample_rate = sample_rate
+
+        # Start sampling thread
+        self._sample_thread = threading.Thread(target=self._sample)
+        self._sample_thread.daemon = True
+        self._sample_thread.start()
+
+    def _sample(self):
+        last_update = time.monotonic_ns()
+        while True:
+            time.sleep(self._sample_rate)
+            self.update_cwnd(self._cwnd_source())
+
+            elapsed = (time.monotonic_ns() - last_update) * 1e-9
+            if (elapsed > self._refresh_rate):
+                self._plot()
+                last_update = time.monotonic_ns()
+
     def _plot(self):
-        elapsed = datetime.datetime.now() - self._last_update
-        if (elapsed.total_seconds() > self._refresh_rate):
-            plt.plot(self._times, self._cwnds, color='red')
-            plt.xlabel('Time')
-            plt.ylabel('CWND')
-            plt.savefig("cwnd.png")
-            self._last_update = datetime.datetime.now()
+        plt.clf()
+        n = self._num_samples
+        plt.plot(self._times[:n], self._cwnds[:n], color='red')
+        plt.xlabel('Time')
+        plt.ylabel('CWND')
+        plt.savefig("cwnd.png")
 
     def update_cwnd(self, cwnd):
-        time = datetime.datetime.now() - self._start_time
-        self._times.append(time.total_seconds())
-        self._cwnds.append(cwnd)
-        self._plot()
\ No newline at end of file
+        # Double the sample arrays when they are full
+        n = self._num_samples
+        if n == len(self._times):
+            self._times = np.resize(self._times, 2 * n)
+            self._cwnds = np.resize(self._cwnds, 2 * n)
+
+        self._times[n] = (time.monotonic_ns() - self._start_time) * 1e-9
+        self._cwnds[n] = cwnd
+        self._num_samples = n + 1
@@ -4,6 +4,10 @@ import time
 import socket
 import threading
 
+# Scatter/gather sends are not available on every platform (e.g. Windows)
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+_HAS_DONTWAIT = hasattr(socket, 'MSG_DONTWAIT')
+
 class LowerLayerEndpoint:
     def __init__(self, local_address=None, remote_address=None, 
             queue_size=0, bandwidth=1, propagation_delay=0.5):
@@ -34,24 +38,31 @@ class LowerLayerEndpoint:
         return self._propagation_delay
 
     def send(self, raw_bytes):
-        threading.Timer(self._propagation_delay, self._enqueue, [raw_bytes]).start()
+        self.send_iov((raw_bytes,))
+
+    def send_iov(self, buffers):
+        """Send a datagram gathered from several buffers without joining them"""
+        threading.Timer(self._propagation_delay, self._enqueue, [buffers]).start()
 
-    def _enqueue(self, raw_bytes):
+    def _enqueue(self, buffers):
         try:
-            self._queue.put(raw_bytes, block=False)
+            self._queue.put(buffers, block=False)
         except queue.Full:
-            logging.info('Lower layer queue full => dropped: {}'.format(raw_bytes)) 
+            logging.info('Lower layer queue full => dropped: %s', buffers) 
 
     def _forward(self):
         while (not self._shutdown):
             try:
-                raw_bytes = self._queue.get(block=False)
+                buffers = self._queue.get(block=False)
             except queue.Empty:
-                raw_bytes = None
+                buffers = None
 
-            if (raw_bytes is not None):
-                result = self._socket.send(raw_bytes)
-                logging.debug('Lower layer forwarded: {}'.format(raw_bytes))
+            if (buffers is not None):
+                if _HAS_SENDMSG:
+                    result = self._socket.sendmsg(buffers)
+                else:
+                    result = self._socket.send(b''.join(buffers))
+                logging.debug('Lower layer forwarded: %s', buffers)
 
             time.sleep(self._transmit_delay)
 
@@ -72,9 +83,57 @@ class LowerLayerEndpoint:
         if len(raw_bytes) == 0:
             return None
         
-        logging.debug('Lower layer received: {}'.format(raw_bytes))
+        logging.debug('Lower layer received: %s', raw_bytes)
         return raw_bytes
 
+    def recv_into(self, buffer):
+        """Receive into a caller-supplied buffer and return the number of bytes
+        received, or None if nothing was received"""
+        if self._remote_address is None:
+            try:
+                (num_bytes, address) = self._socket.recvfrom_into(buffer)
+            except OSError:
+                return None
+            self._remote_address = address
+            self._socket.connect(self._remote_address)
+        else:
+            try:
+                num_bytes = self._socket.recv_into(buffer)
+            except OSError:
+                return None
+
+        if num_bytes == 0:
+            return None
+
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug('Lower layer received: %s', bytes(buffer[:num_bytes]))
+        return num_bytes
+
+    def recv_many(self, buffers):
+        """Block until a datagram arrives, then drain datagrams that are already
+        queued into the remaining buffers without blocking; returns the number
+        of bytes received into each buffer used, or None if nothing was received"""
+        num_bytes = self.recv_into(buffers[0])
+        if num_bytes is None:
+            return None
+        counts = [num_bytes]
+        if not _HAS_DONTWAIT:
+            return counts
+
+        while len(counts) < len(buffers):
+            buffer = buffers[len(counts)]
+            try:
+                num_bytes = self._socket.recv_into(buffer, 0, socket.MSG_DONTWAIT)
+            except OSError:
+                break
+            if num_bytes == 0:
+                break
+
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug('Lower layer received: %s', bytes(buffer[:num_bytes]))
+            counts.append(num_bytes)
+        return counts
+
     def shutdown(self):
         if (not self._shutdown):
             self._socket.shutdown(socket.SHUT_RDWR)